@@ -2,19 +2,205 @@
 Classes for chess pieces and board
 """
 
-from typing import Optional
-from enum import Enum
+import random
+from typing import Iterator, Optional
+from enum import IntEnum
 
-Position = tuple[int, int]
+# Square index r*8+f, where r = 0 is the 8th rank and f = 0 is file a
+Position = int
 
-class Color(Enum):
+# Relative (rank, file) moves of the pieces that jump to fixed squares
+KNIGHT_OFFSETS: tuple[tuple[int, int], ...] = ((-2, -1), (-2, 1), (-1, -2),
+                                               (-1, 2), (1, -2), (1, 2),
+                                               (2, -1), (2, 1))
+KING_OFFSETS: tuple[tuple[int, int], ...] = ((-1, -1), (-1, 0), (-1, 1),
+                                             (0, -1), (0, 1), (1, -1),
+                                             (1, 0), (1, 1))
+
+
+# Bitboard masks (bit r*8+f, where r = 0 is the 8th rank and f = 0 is file a)
+FULL: int = (1 << 64) - 1
+NOT_FILE_A: int = FULL ^ 0x0101010101010101
+NOT_FILE_H: int = FULL ^ 0x8080808080808080
+RANK_3: int = 0xFF << 40
+RANK_6: int = 0xFF << 16
+
+
+def _attack_table(offsets: tuple[tuple[int, int], ...]) -> tuple[int, ...]:
+    """
+    Returns, for each square r*8+f, the bitboard of squares reached by the
+    given offsets that are still on the board
+    """
+    table = []
+    for r in range(8):
+        for f in range(8):
+            bb = 0
+            for i, j in offsets:
+                if 0 <= r + i <= 7 and 0 <= f + j <= 7:
+                    bb |= 1 << ((r + i) * 8 + f + j)
+            table.append(bb)
+
+    return tuple(table)
+
+
+KNIGHT_ATTACKS: tuple[int, ...] = _attack_table(KNIGHT_OFFSETS)
+KING_ATTACKS: tuple[int, ...] = _attack_table(KING_OFFSETS)
+
+# Squares attacked by a pawn on each square, indexed by color (white first)
+PAWN_ATTACKS: tuple[tuple[int, ...], tuple[int, ...]] = (
+    _attack_table(((-1, -1), (-1, 1))), _attack_table(((1, -1), (1, 1))))
+
+
+def _ray_tables() -> tuple[tuple[tuple[int, ...], ...], tuple[int, ...],
+                           tuple[int, ...]]:
+    """
+    Returns the squares strictly between each pair of squares that share a
+    rank, file, or diagonal (0 for other pairs), and the rook and bishop
+    attacks of each square on an empty board
+    """
+    between = [[0] * 64 for _ in range(64)]
+    rook_rays = [0] * 64
+    bishop_rays = [0] * 64
+    for sq in range(64):
+        for i, j in KING_OFFSETS:
+            r, f = sq // 8 + i, sq % 8 + j
+            bb = 0
+            while 0 <= r <= 7 and 0 <= f <= 7:
+                between[sq][r * 8 + f] = bb
+                bb |= 1 << (r * 8 + f)
+                r, f = r + i, f + j
+            if i == 0 or j == 0:
+                rook_rays[sq] |= bb
+            else:
+                bishop_rays[sq] |= bb
+
+    return (tuple(tuple(row) for row in between), tuple(rook_rays),
+            tuple(bishop_rays))
+
+
+BETWEEN, ROOK_RAYS, BISHOP_RAYS = _ray_tables()
+
+
+# Sliding pieces look up their attacks by the occupancy of the rank, file, or
+# diagonal through their square. Board._lines packs the occupancy of every
+# line so that each line is a run of contiguous bits: ranks in bits 0-63,
+# files in 64-127, r-f diagonals in 128-191, and r+f diagonals in 192-255
+
+def _line_systems() -> tuple[list[list[int]], ...]:
+    """
+    Returns the squares of every rank, file, and diagonal, in packing order
+    """
+    ranks = [[r * 8 + f for f in range(8)] for r in range(8)]
+    files = [[r * 8 + f for r in range(8)] for f in range(8)]
+    diagonals = [[r * 8 + r - d for r in range(8) if 0 <= r - d <= 7]
+                 for d in range(-7, 8)]
+    anti_diagonals = [[r * 8 + d - r for r in range(8) if 0 <= d - r <= 7]
+                      for d in range(15)]
+    return ranks, files, diagonals, anti_diagonals
+
+
+def _line_attacks(n: int, i: int) -> list[int]:
+    """
+    Returns, for each occupancy of a line of n squares, the squares that a
+    slider on square i of the line attacks (as bits of the line)
+    """
+    result = []
+    for occ in range(1 << n):
+        attacks = 0
+        for step in (-1, 1):
+            j = i + step
+            while 0 <= j < n:
+                attacks |= 1 << j
+                if (occ >> j) & 1:
+                    break
+                j += step
+        result.append(attacks)
+
+    return result
+
+
+def _slider_tables() -> tuple[tuple[int, ...],
+                              tuple[tuple[tuple[int, int, tuple[int, ...]],
+                                          ...], ...]]:
+    """
+    Returns the bits each square sets in Board._lines, and for each line
+    system and square the (shift, mask, attacks) used to look up attacks,
+    where attacks[(lines >> shift) & mask] is the attacked bitboard
+    """
+    line_bits = [0] * 64
+    lookups = []
+    local_cache: dict[tuple[int, int], list[int]] = {}
+    shift = 0
+
+    for system in _line_systems():
+        lookup: list[tuple[int, int, tuple[int, ...]]] = [(0, 0, ())] * 64
+        for line in system:
+            n = len(line)
+
+            # Bitboard of each subset of the line's squares
+            expand = [0] * (1 << n)
+            for m in range(1, 1 << n):
+                low = m & -m
+                expand[m] = expand[m ^ low] | (1 << line[low.bit_length() - 1])
+
+            for i, sq in enumerate(line):
+                line_bits[sq] |= 1 << (shift + i)
+                if (n, i) not in local_cache:
+                    local_cache[(n, i)] = _line_attacks(n, i)
+                attacks = tuple(expand[m] for m in local_cache[(n, i)])
+                lookup[sq] = (shift, (1 << n) - 1, attacks)
+
+            shift += n
+        lookups.append(tuple(lookup))
+
+    return tuple(line_bits), tuple(lookups)
+
+
+_LINE_BITS, (_RANK_LOOKUP, _FILE_LOOKUP, _DIAGONAL_LOOKUP,
+             _ANTI_DIAGONAL_LOOKUP) = _slider_tables()
+
+
+def _zobrist_keys() -> tuple[tuple[int, ...], ...]:
+    """
+    Returns a random 64-bit key for each bitboard index and square, from a
+    fixed seed so hashes are the same in every run
+    """
+    rng = random.Random(0x5EED)
+    return tuple(tuple(rng.getrandbits(64) for _ in range(64))
+                 for _ in range(12))
+
+
+# ZOBRIST[index][sq] is XORed into the board hash while that piece is on sq
+ZOBRIST: tuple[tuple[int, ...], ...] = _zobrist_keys()
+
+# Key for the side to move (0 for white, 1 for black), for game-level hashes
+ZOBRIST_TURN: tuple[int, int] = (0, random.Random(0x7E2A).getrandbits(64))
+
+
+def bb_iter(bb: int) -> Iterator[int]:
+    """
+    Yields the square index of each set bit of a bitboard, lowest first
+    """
+    while bb:
+        lsb = bb & -bb
+        yield lsb.bit_length() - 1
+        bb ^= lsb
+
+
+def bb_to_positions(bb: int) -> list[Position]:
+    """
+    Returns the positions of the set bits of a bitboard
+    """
+    return list(bb_iter(bb))
+
+class Color(IntEnum):
     """
     Piece color
     """
     W = 0
     B = 1
 
-class PieceType(Enum):
+class PieceType(IntEnum):
     """
     Piece type
     """
@@ -32,9 +218,13 @@ class Piece:
     Attributes:
         _color: color of the piece
         _ptype: type of the piece
+        _str: name of the piece (eg. BK), built once since pieces are immutable
     """
+    __slots__ = ("_color", "_ptype", "_str")
+
     _color: Color
     _ptype: PieceType
+    _str: str
     # _position: Position
 
     def __init__(self, color: Color, ptype: PieceType) -> None:
@@ -43,6 +233,7 @@ class Piece:
         """
         self._color = color
         self._ptype = ptype
+        self._str = f"{color.name}{ptype.name}"
 
     @property
     def color(self) -> Color:
@@ -53,7 +244,36 @@ class Piece:
         return self._ptype
 
     def __str__(self) -> str:
-        return f"{self.color.name}{self.ptype.name}"
+        return self._str
+
+    @classmethod
+    def get(cls, color: Color, ptype: PieceType) -> "Piece":
+        """
+        Returns the shared piece object of the given color and type
+        """
+        return _PIECE_CACHE[(color, ptype)]
+
+
+# There are only 12 distinct pieces, so every caller shares these objects
+_PIECE_CACHE: dict[tuple[Color, PieceType], Piece] = {
+    (color, ptype): Piece(color, ptype) for color in Color
+    for ptype in PieceType}
+
+
+def _piece_index(color: Color, ptype: PieceType) -> int:
+    """
+    Returns the index of the bitboard for the given color and piece type
+    """
+    return color * 6 + ptype
+
+
+# Shared piece object for each mailbox code (bitboard index + 1, 0 is empty)
+_CODE_TO_PIECE: tuple[Optional[Piece], ...] = (None,) + tuple(
+    Piece.get(color, ptype) for color in Color for ptype in PieceType)
+
+# Board square text for each mailbox code
+_CODE_TO_STR: tuple[str, ...] = ("--",) + tuple(
+    str(piece) for piece in _CODE_TO_PIECE[1:])
 
 
 class Board:
@@ -61,67 +281,180 @@ class Board:
     Implementation of chess board
 
     Attributes:
-        _board: matrix representation of the board, storing Piece objects
+        _bb: one bitboard per piece kind (see _piece_index), where bit r*8+f
+            is set if that kind of piece is on that square
+        _occupied: bitboards of all white pieces and all black pieces
+        _mailbox: piece code of each square r*8+f (bitboard index + 1, or 0
+            if the square is empty)
+        _hash: Zobrist hash of the pieces on the board
+        _lines: occupancy of every rank, file, and diagonal, packed so that
+            slider attacks can be looked up directly (see _slider_tables)
     """
-    _board: list[list[Optional[Piece]]]
-    # _pieces_on_board: dict[Position: Piece]
+    __slots__ = ("_bb", "_occupied", "_mailbox", "_hash", "_lines")
+
+    _bb: list[int]
+    _occupied: list[int]
+    _mailbox: bytearray
+    _hash: int
+    _lines: int
+
+    first_rank_setup: tuple[PieceType, ...] = (PieceType.R, PieceType.N,
+                                               PieceType.B, PieceType.Q,
+                                               PieceType.K, PieceType.B,
+                                               PieceType.N, PieceType.R)
 
     def __init__(self) -> None:
         """
         Constructor
-        Creates an 8x8 game board
+        Creates an empty 8x8 game board
         """
-        self._board = [[None] * 8 for _ in range(8)]
-        self._pieces_on_board = {}
+        self._bb = [0] * 12
+        self._occupied = [0, 0]
+        self._mailbox = bytearray(64)
+        self._hash = 0
+        self._lines = 0
     
     def is_valid_position(self, pos: Position) -> bool:
         """
         Determines if the position is valid
         """
-        r, f = pos
-        return 0 <= r <= 7 and 0 <= f <= 7
+        return 0 <= pos <= 63
+
+    @property
+    def occupied(self) -> int:
+        """
+        Returns the bitboard of all occupied squares
+        """
+        return self._occupied[0] | self._occupied[1]
+
+    @property
+    def hash(self) -> int:
+        """
+        Returns the Zobrist hash of the pieces on the board, which is kept up
+        to date as pieces are added, removed, and moved
+        """
+        return self._hash
+
+    @property
+    def mailbox(self) -> bytearray:
+        """
+        Returns the piece code of every square r*8+f (0 if empty, otherwise
+        color * 6 + ptype + 1). The bytearray is live and must not be modified
+        """
+        return self._mailbox
+
+    def occupancy(self, color: int) -> int:
+        """
+        Returns the bitboard of squares occupied by pieces of the given color
+        """
+        return self._occupied[color]
+
+    def pieces(self, color: int, ptype: int) -> int:
+        """
+        Returns the bitboard of squares holding pieces of the given color and
+        type
+        """
+        return self._bb[color * 6 + ptype]
+
+    def rook_attacks(self, sq: int) -> int:
+        """
+        Returns the bitboard of squares a rook on square sq attacks, up to and
+        including the first piece in each direction
+        """
+        lines = self._lines
+        shift, mask, attacks = _RANK_LOOKUP[sq]
+        result = attacks[(lines >> shift) & mask]
+        shift, mask, attacks = _FILE_LOOKUP[sq]
+        return result | attacks[(lines >> shift) & mask]
+
+    def bishop_attacks(self, sq: int) -> int:
+        """
+        Returns the bitboard of squares a bishop on square sq attacks, up to
+        and including the first piece in each direction
+        """
+        lines = self._lines
+        shift, mask, attacks = _DIAGONAL_LOOKUP[sq]
+        result = attacks[(lines >> shift) & mask]
+        shift, mask, attacks = _ANTI_DIAGONAL_LOOKUP[sq]
+        return result | attacks[(lines >> shift) & mask]
 
     @property
     def pieces_on_board(self) -> dict[Position, Piece]:
         """
-        Returns the _pieces_on_board attribute
+        Returns a dict of every occupied position and the piece on it
+        """
+        return {sq: _CODE_TO_PIECE[code]
+                for sq, code in enumerate(self._mailbox) if code}
+
+    ### Unchecked square access ###
+
+    def _square(self, pos: Position) -> int:
+        """
+        Returns the square index of a position
+        Raises ValueError if position is invalid
+        """
+        if not 0 <= pos <= 63:
+            raise ValueError("Board Error: Invalid position")
+
+        return pos
+
+    def _get(self, sq: int) -> Optional[Piece]:
+        """
+        Returns the piece on square sq, or None if it is empty
+        Does not validate sq
         """
-        return self._pieces_on_board
+        return _CODE_TO_PIECE[self._mailbox[sq]]
+
+    def _set(self, sq: int, piece: Piece) -> None:
+        """
+        Puts a piece on square sq
+        Does not validate sq or check that it is empty
+        """
+        bit = 1 << sq
+        index = _piece_index(piece.color, piece.ptype)
+        self._bb[index] |= bit
+        self._occupied[piece.color] |= bit
+        self._mailbox[sq] = index + 1
+        self._hash ^= ZOBRIST[index][sq]
+        self._lines |= _LINE_BITS[sq]
+
+    def _clear(self, sq: int) -> Optional[Piece]:
+        """
+        Removes the piece on square sq and returns it, or None if it is empty
+        Does not validate sq
+        """
+        code = self._mailbox[sq]
+        if code:
+            bit = 1 << sq
+            self._bb[code - 1] ^= bit
+            self._occupied[(code - 1) // 6] ^= bit
+            self._mailbox[sq] = 0
+            self._hash ^= ZOBRIST[code - 1][sq]
+            self._lines ^= _LINE_BITS[sq]
+
+        return _CODE_TO_PIECE[code]
 
     ### Modify board ###
 
     def add_piece(self, piece: Piece, pos: Position) -> None:
         """
-        Puts a piece in the given position if it is empty and adds that piece
-        to _pieces_on_board
+        Puts a piece in the given position if it is empty
         Raises ValueError if it is not empty
         Raises ValueError if position is invalid
         """
-        r, f = pos
-        if not self.is_valid_position(pos):
-            raise ValueError("Board Error: Invalid position")
-
-        if self.is_empty(pos):
-            self._board[r][f] = piece
-            self._pieces_on_board[pos] = piece
-        else:
+        sq = self._square(pos)
+        if self._mailbox[sq]:
             raise ValueError("Board Error: Position already occupied")
 
+        self._set(sq, piece)
+
     def remove_piece(self, pos: Position) -> Optional[Piece]:
         """
         Removes the piece from the given position and returns its value
         Returns None if the position is empty
         Raises ValueError if position is invalid
         """
-        r, f = pos
-        if not self.is_valid_position(pos):
-            raise ValueError("Board Error: Invalid position")
-
-        if self._board[r][f] is None:
-            return None
-
-        self._board[r][f] = None
-        return self._pieces_on_board.pop(pos)
+        return self._clear(self._square(pos))
 
     def get_piece(self, pos: Position) -> Optional[Piece]:
         """
@@ -130,22 +463,14 @@ class Board:
         Returns None if the position is empty
         Raises ValueError if position is invalid
         """
-        r, f = pos
-        if not self.is_valid_position(pos):
-            raise ValueError("Board Error: Invalid position")
-
-        return self._board[r][f]
+        return self._get(self._square(pos))
 
     def is_empty(self, pos: Position) -> bool:
         """
         Returns whether the position is empty
         Raises ValueError if position is invalid
         """
-        r, f = pos
-        if not self.is_valid_position(pos):
-            raise ValueError("Board Error: Invalid position")
-
-        return self._board[r][f] is None
+        return not self._mailbox[self._square(pos)]
 
     def move_piece(self, pos1: Position, pos2: Position) -> Optional[Piece]:
         """
@@ -157,14 +482,34 @@ class Board:
         if pos1 == pos2:
             raise ValueError("Board Error: Can't move to same square")
 
-        moved_piece = self.remove_piece(pos1)
-        if moved_piece is None:
+        sq1 = self._square(pos1)
+        sq2 = self._square(pos2)
+
+        mailbox = self._mailbox
+        code = mailbox[sq1]
+        if not code:
             raise ValueError("Board Error: Can't move from empty square")
+        captured = mailbox[sq2]
+
+        # XOR works out even if the captured piece is the same color or kind
+        bits = (1 << sq1) | (1 << sq2)
+        self._bb[code - 1] ^= bits
+        self._occupied[(code - 1) // 6] ^= bits
+        self._hash ^= ZOBRIST[code - 1][sq1] ^ ZOBRIST[code - 1][sq2]
+        self._lines ^= _LINE_BITS[sq1]
+
+        if captured:
+            bit = 1 << sq2
+            self._bb[captured - 1] ^= bit
+            self._occupied[(captured - 1) // 6] ^= bit
+            self._hash ^= ZOBRIST[captured - 1][sq2]
+        else:
+            self._lines ^= _LINE_BITS[sq2]
 
-        captured_piece = self.remove_piece(pos2)
-        self.add_piece(moved_piece, pos2)
+        mailbox[sq1] = 0
+        mailbox[sq2] = code
 
-        return captured_piece
+        return _CODE_TO_PIECE[captured]
 
     # def capture_piece(self, pos1: Position, pos2: Position) -> Piece:
     #     """
@@ -185,25 +530,78 @@ class Board:
 
     #     return captured_piece
         
+    def set_up(self) -> None:
+        """
+        Puts all pieces in their starting positions, replacing anything
+        already on the board
+        """
+        self._bb[:] = _STARTING_BB
+        self._occupied[:] = _STARTING_OCCUPIED
+        self._mailbox[:] = _STARTING_MAILBOX
+        self._hash = _STARTING_HASH
+        self._lines = _STARTING_LINES
+
+    def copy(self) -> "Board":
+        """
+        Returns an independent copy of the board
+        """
+        new = Board.__new__(Board)
+        new._bb = self._bb.copy()
+        new._occupied = self._occupied.copy()
+        new._mailbox = self._mailbox[:]
+        new._hash = self._hash
+        new._lines = self._lines
+        return new
+
+    def __deepcopy__(self, memo: dict) -> "Board":
+        """
+        Makes copy.deepcopy use copy, since pieces are shared and immutable
+        """
+        return self.copy()
+
     def clear(self) -> None:
         """
         Removes all pieces on the board
         """
-        for i, rank in enumerate(self._board):
-            for j, _ in enumerate(rank):
-                self._board[i][j] = None
+        self._bb[:] = _EMPTY_BB
+        self._occupied[:] = _EMPTY_OCCUPIED
+        self._mailbox[:] = _EMPTY_MAILBOX
+        self._hash = 0
+        self._lines = 0
 
     def __str__(self) -> str:
         """
         String representation of board for tui
         """
-        result = "  a  b  c  d  e  f  g  h "
-        for i, r in enumerate(self._board):
-            result += f"\n{8-i}"
-            for piece in r:
-                if piece is None:
-                    result += " --"
-                else:
-                    result += " " + str(piece)
+        parts = ["  a  b  c  d  e  f  g  h "]
+        for i in range(0, 64, 8):
+            parts.append(f"\n{8 - i // 8}")
+            for code in self._mailbox[i:i + 8]:
+                parts.append(" " + _CODE_TO_STR[code])
         
-        return result
+        return "".join(parts)
+
+
+def _starting_position() -> tuple[tuple[int, ...], tuple[int, int], bytes,
+                                  int, int]:
+    """
+    Builds the bitboards, occupancy, mailbox, hash, and line occupancy of the
+    starting position
+    """
+    board = Board()
+    for i, ptype in enumerate(Board.first_rank_setup):
+        board.add_piece(Piece.get(Color.B, ptype), i)
+        board.add_piece(Piece.get(Color.B, PieceType.P), 8 + i)
+        board.add_piece(Piece.get(Color.W, PieceType.P), 48 + i)
+        board.add_piece(Piece.get(Color.W, ptype), 56 + i)
+
+    return (tuple(board._bb), (board._occupied[0], board._occupied[1]),
+            bytes(board._mailbox), board._hash, board._lines)
+
+
+# Snapshots copied by Board.clear and Board.set_up
+_EMPTY_BB: tuple[int, ...] = (0,) * 12
+_EMPTY_OCCUPIED: tuple[int, int] = (0, 0)
+_EMPTY_MAILBOX: bytes = bytes(64)
+(_STARTING_BB, _STARTING_OCCUPIED, _STARTING_MAILBOX, _STARTING_HASH,
+ _STARTING_LINES) = _starting_position()
@@ -2,32 +2,44 @@
 Internal game logic of the chess game
 """
 
-import numpy
-import operator
-from copy import deepcopy
-from typing import Optional
-from board import Position, Color, PieceType, Piece, Board
-
+from typing import Callable, Optional
+from board import (Position, Color, PieceType, Piece, Board, KNIGHT_ATTACKS,
+                   KING_ATTACKS, PAWN_ATTACKS, BETWEEN, ROOK_RAYS,
+                   BISHOP_RAYS, FULL, NOT_FILE_A, NOT_FILE_H, RANK_3, RANK_6,
+                   ZOBRIST_TURN, bb_iter, bb_to_positions)
+
+try:
+    import chess_core
+except ImportError:
+    chess_core = None
+
+# Shared piece for each valid piece name (eg. BK), used by str_to_piece
+_PIECE_NAMES: dict[str, Piece] = {f"{color.name}{ptype.name}":
+                                  Piece.get(color, ptype)
+                                  for color in Color for ptype in PieceType}
 
 class ChessStub:
     """
     Stub implementation of chess game
     """
 
+    __slots__ = ("_board", "_turn", "_captured", "_undo_stack", "_move_cache",
+                 "_white_can_castle", "_black_can_castle")
+
     _board: Board
     _turn: int
-    _captured_pieces: dict[str, list[str]]
+    _captured: bytearray
+    _undo_stack: list[tuple[Position, Position, Optional[Piece], int]]
+    _move_cache: dict[tuple[Position, int], tuple[Position, ...]]
 
     _white_can_castle: bool
     _black_can_castle: bool
 
-    piece_values: dict[str, int] = {"P": 1, "N": 3, "B": 3, "R": 5, "Q": 9,
-                                    "K": 0}
-    
-    first_rank_setup: list[PieceType] = [PieceType.R, PieceType.N,
-                                         PieceType.B, PieceType.Q,
-                                         PieceType.K, PieceType.B,
-                                         PieceType.N, PieceType.R]
+    # Indexed by PieceType
+    piece_values: tuple[int, ...] = (1, 3, 3, 5, 9, 0)
+
+    # Number of entries a cache can hold before it is emptied
+    cache_limit: int = 4096
 
     def __init__(self) -> None:
         """
@@ -36,7 +48,9 @@ class ChessStub:
         """
         self._board = Board()
         self._turn = 0
-        self._captured_pieces = {"W": [], "B": []}
+        self._captured = bytearray(12)
+        self._undo_stack = []
+        self._move_cache = {}
 
     @property
     def board(self) -> Board:
@@ -52,18 +66,49 @@ class ChessStub:
         """
         return self._turn
     
+    @property
+    def zobrist(self) -> int:
+        """
+        Returns the Zobrist hash of the position, including the side to move
+        """
+        return self._board.hash ^ ZOBRIST_TURN[self._turn]
+
+    @property
+    def captured_pieces(self) -> dict[str, list[str]]:
+        """
+        Returns the names of the captured pieces of each color (eg.
+        {"W": ["WP"], "B": []} after white loses a pawn)
+        """
+        result: dict[str, list[str]] = {"W": [], "B": []}
+        for i, count in enumerate(self._captured):
+            color = Color(i // 6)
+            name = f"{color.name}{PieceType(i % 6).name}"
+            result[color.name].extend([name] * count)
+
+        return result
+
+    @property
+    def material_balance(self) -> int:
+        """
+        Returns the value of the black pieces captured minus the value of the
+        white pieces captured (positive if white is ahead in material)
+        """
+        balance = 0
+        for i, count in enumerate(self._captured):
+            value = count * self.piece_values[i % 6]
+            balance += value if i >= 6 else -value
+
+        return balance
+
     @property
     def is_in_check(self) -> bool:
         """
         Returns whether the current player is in check or not
         """
-        for pos, piece in self.board.pieces_on_board.items():
-            if piece.color.value != self.turn:
-                moves = self.list_legal_moves(pos, simulated=True)
-                for move in moves:
-                    target = self.board.get_piece(move)
-                    if target is not None and target.ptype == PieceType.K:
-                        return True
+        opponent = 1 - self._turn
+        for sq in bb_iter(self._board.pieces(self._turn, PieceType.K)):
+            if self._square_attacked_by(sq, opponent):
+                return True
 
         return False
     
@@ -78,172 +123,264 @@ class ChessStub:
         """
         Restarts the game in the starting position, white to move
         """
-        self.board.clear()
-
-        for i in range(8):
-            self.board.add_piece(Piece(Color.B, self.first_rank_setup[i]), (0, i))
-            self.board.add_piece(Piece(Color.B, PieceType.P), (1, i))
-            self.board.add_piece(Piece(Color.W, PieceType.P), (6, i))
-            self.board.add_piece(Piece(Color.W, self.first_rank_setup[i]), (7, i))
+        self._board.set_up()
 
         self._turn = 0
-        self._captured_pieces = {"W": [], "B": []}
+        self._captured = bytearray(12)
+        self._undo_stack = []
+        self._move_cache.clear()
 
     def next_turn(self) -> None:
         """
         Changes the turn to the other player
         """
-        if self._turn == 0:
-            self._turn = 1
-        else:
-            self._turn = 0
+        self._turn ^= 1
 
     def list_legal_moves(self, pos: Position, simulated: bool = False) -> list[Position]:
         """
         Lists the squares that the piece at pos can legally move to (includes
         captures)
 
-        simulated (default false) is set to true when this function is used
-        within the _would_be_check method, as a check is still valid even if
-        "capturing the king" would put the opponent in check as well
+        If simulated (default false) is true, the pseudo-legal targets are
+        returned instead: moves that leave the player's king in check are
+        included, and the piece doesn't have to belong to the player to move.
+        These results are not cached
         """
-        if not self.board.is_valid_position(pos):
+        board = self._board
+        if not board.is_valid_position(pos):
             raise ValueError("Game Error: invalid position")
         
-        piece = self.board.get_piece(pos)
-
-        r, f = pos
-        result = []
+        piece = board.get_piece(pos)
 
         if piece is None:
-            return result
-        
-        assert isinstance(piece, Piece)
-        if not simulated and piece.color.value != self.turn:
-            return result
-
-        # Pawn
-        if piece.ptype == PieceType.P:
-            op = operator.sub if piece.color == Color.W else operator.add
-            start_rank = 6 if piece.color == Color.W else 1
-
-            # Pawn moves
-            single_move = (op(r, 1), f)
-            if self.board.is_valid_position(single_move) and\
-                self.board.is_empty(single_move):
-                result.append(single_move)
-                
-                double_move = (op(r, 2), f)
-                if r == start_rank and\
-                self.board.is_valid_position(double_move) and\
-                self.board.is_empty(double_move):
-                    result.append(double_move)
-
-            # Pawn captures
-            for i in [-1, 1]:
-                capture = (op(r, 1), f+i)
-                if self.board.is_valid_position(capture) and\
-                isinstance(self.board.get_piece(capture), Piece) and\
-                self.board.get_piece(capture).color != piece.color:
-                    result.append(capture)
-
-        # Knight
-        elif piece.ptype == PieceType.N:
-            for i, j in [(-2,-1), (-2,1), (-1,-2), (-1,2),
-                         (1,-2), (1,2), (2,-1), (2,1)]:
-                move = ((r+i, f+j))
-                if self.board.is_valid_position(move):
-                    if isinstance(self.board.get_piece(move), Piece) and\
-                    self.board.get_piece(move).color == piece.color:
-                        continue
-                    result.append(move)
-
-        # Bishop
-        elif piece.ptype == PieceType.B:
-            for direction in [(-1,-1), (-1,1), (1,-1), (1,1)]:
-                result.extend(self._long_moves(pos, direction))
-
-        # Rook
-        elif piece.ptype == PieceType.R:
-            for direction in [(-1,0), (0,-1), (0,1), (1,0)]:
-                result.extend(self._long_moves(pos, direction))
-
-        # Queen
-        elif piece.ptype == PieceType.Q:
-            for direction in [(-1,-1), (-1,1), (1,-1), (1,1),
-                              (-1,0), (0,-1), (0,1), (1,0)]:
-                result.extend(self._long_moves(pos, direction))
-
-        # King
-        elif piece.ptype == PieceType.K:
-            for i, j in [(-1,-1), (-1,0), (-1,1), (0,-1),
-                         (0,1), (1,-1), (1,0), (1,1)]:
-                move = ((r+i, f+j))
-                if self.board.is_valid_position(move):
-                    if isinstance(self.board.get_piece(move), Piece) and\
-                    self.board.get_piece(move).color == piece.color:
-                        continue
-                    result.append(move)
+            return []
+
+        if not simulated and piece.color != self._turn:
+            return []
 
         if simulated:
-            return result
-        
-        return [move for move in result if not self._would_be_check(pos, move)]
+            targets = ChessStub._MOVE_GEN[piece.ptype](self, pos, piece)
+            return bb_to_positions(targets)
+
+        # Filtering out moves into check is the expensive part, so only these
+        # results are cached, keyed by the position they were generated in
+        key = (pos, self.zobrist)
+        cached = self._move_cache.get(key)
+        if cached is not None:
+            return list(cached)
+
+        if chess_core is not None:
+            result = bb_to_positions(chess_core.legal_targets(board.mailbox, pos))
+        else:
+            targets = ChessStub._MOVE_GEN[piece.ptype](self, pos, piece)
+            result = bb_to_positions(self._legal_targets(pos, piece, targets))
+
+        if len(self._move_cache) >= self.cache_limit:
+            self._move_cache.clear()
+        self._move_cache[key] = tuple(result)
+
+        return result
+
+    ### Move generators ###
+    # Each returns the bitboard of squares the piece on square sq can move to
+
+    def _pawn_moves(self, sq: int, piece: Piece) -> int:
+        """
+        Returns the moves and captures of the pawn on sq
+        """
+        pawn = 1 << sq
+        board = self._board
+        empty = ~board.occupied & FULL
+        opponents = board.occupancy(1 - piece.color)
+
+        if piece.color == Color.W:
+            single = (pawn >> 8) & empty
+            double = ((single & RANK_3) >> 8) & empty
+            captures = ((pawn >> 9) & NOT_FILE_H) | ((pawn >> 7) & NOT_FILE_A)
+        else:
+            single = (pawn << 8) & empty
+            double = ((single & RANK_6) << 8) & empty
+            captures = ((pawn << 7) & NOT_FILE_H) | ((pawn << 9) & NOT_FILE_A)
+
+        return single | double | (captures & opponents)
 
-    def _long_moves(self, pos: Position, direction: Position) -> list[Position]:
+    def _knight_moves(self, sq: int, piece: Piece) -> int:
         """
-        Returns a list of all legal "long" moves (bishop/rook/queen) based on
-        the given direction
+        Returns the moves and captures of the knight on sq
         """
-        r, f = pos
-        i, j = direction
+        return KNIGHT_ATTACKS[sq] & ~self._board.occupancy(piece.color)
 
-        if i == 0 and j == 0:
-            raise ValueError("Game Error: long move direction can't be (0,0)")
+    def _bishop_moves(self, sq: int, piece: Piece) -> int:
+        """
+        Returns the moves and captures of the bishop on sq
+        """
+        return self._board.bishop_attacks(sq) & ~self._board.occupancy(piece.color)
 
-        if isinstance(self.board.get_piece(pos), Piece):
-            color = self.board.get_piece(pos).color
-        else:
-            raise ValueError("Game Error: can't find long moves from empty position")
-
-        result = []
-
-        legal = True
-
-        while legal:
-            move = (r+i, f+j)
-            if self.board.is_valid_position(move):
-                if isinstance(self.board.get_piece(move), Piece):
-                    if self.board.get_piece(move).color == color:
-                        legal = False
-                    else:
-                        result.append(move)
-                        legal = False
-                else:
-                    result.append(move)
-                    i += numpy.sign(i)
-                    j += numpy.sign(j)
-            else:
-                legal = False
+    def _rook_moves(self, sq: int, piece: Piece) -> int:
+        """
+        Returns the moves and captures of the rook on sq
+        """
+        return self._board.rook_attacks(sq) & ~self._board.occupancy(piece.color)
+
+    def _queen_moves(self, sq: int, piece: Piece) -> int:
+        """
+        Returns the moves and captures of the queen on sq
+        """
+        board = self._board
+        return (board.rook_attacks(sq) | board.bishop_attacks(sq)) &\
+            ~board.occupancy(piece.color)
+
+    def _king_moves(self, sq: int, piece: Piece) -> int:
+        """
+        Returns the moves and captures of the king on sq
+        """
+        return KING_ATTACKS[sq] & ~self._board.occupancy(piece.color)
+
+    # Move generator for each piece type, used by list_legal_moves
+    _MOVE_GEN: dict[PieceType, Callable[["ChessStub", int, Piece], int]] = {
+        PieceType.P: _pawn_moves,
+        PieceType.N: _knight_moves,
+        PieceType.B: _bishop_moves,
+        PieceType.R: _rook_moves,
+        PieceType.Q: _queen_moves,
+        PieceType.K: _king_moves,
+    }
+
+    def _square_attacked_by(self, sq: int, by_color: int) -> bool:
+        """
+        Returns whether any piece of by_color attacks square sq, by looking
+        outward from sq as each piece type for an attacker of that type
+        """
+        board = self._board
+        if KNIGHT_ATTACKS[sq] & board.pieces(by_color, PieceType.N):
+            return True
+        if KING_ATTACKS[sq] & board.pieces(by_color, PieceType.K):
+            return True
+        if PAWN_ATTACKS[1 - by_color][sq] & board.pieces(by_color, PieceType.P):
+            return True
+
+        queens = board.pieces(by_color, PieceType.Q)
+        if board.rook_attacks(sq) & (board.pieces(by_color, PieceType.R) | queens):
+            return True
+
+        return bool(board.bishop_attacks(sq) &
+                    (board.pieces(by_color, PieceType.B) | queens))
+
+    def _pins_and_check_mask(self, king_sq: int,
+                             enemy: int) -> tuple[dict[int, int], int]:
+        """
+        Returns the pin ray (including the pinning piece) of each piece pinned
+        to the king on king_sq, and the bitboard of squares that a non-king
+        move must land on to get out of check (FULL if not in check)
+        """
+        board = self._board
+        occupied = board.occupied
+        own = board.occupancy(1 - enemy)
+        queens = board.pieces(enemy, PieceType.Q)
+
+        checkers = (KNIGHT_ATTACKS[king_sq] & board.pieces(enemy, PieceType.N)) |\
+            (KING_ATTACKS[king_sq] & board.pieces(enemy, PieceType.K)) |\
+            (PAWN_ATTACKS[1 - enemy][king_sq] & board.pieces(enemy, PieceType.P))
+        sliders = (ROOK_RAYS[king_sq] & (board.pieces(enemy, PieceType.R) | queens)) |\
+            (BISHOP_RAYS[king_sq] & (board.pieces(enemy, PieceType.B) | queens))
+
+        pin_rays: dict[int, int] = {}
+        for sq in bb_iter(sliders):
+            between = BETWEEN[king_sq][sq]
+            blockers = between & occupied
+            if not blockers:
+                checkers |= 1 << sq
+            elif not blockers & (blockers - 1) and blockers & own:
+                pin_rays[blockers.bit_length() - 1] = between | (1 << sq)
+
+        if not checkers:
+            return pin_rays, FULL
+        if checkers & (checkers - 1):
+            # Double check, only the king can move
+            return pin_rays, 0
+
+        checker = checkers.bit_length() - 1
+        return pin_rays, checkers | BETWEEN[king_sq][checker]
+
+    def _legal_targets(self, sq: int, piece: Piece, targets: int) -> int:
+        """
+        Returns the squares in targets that the piece on sq can move to
+        without leaving its king in check
+        """
+        board = self._board
+        kings = board.pieces(piece.color, PieceType.K)
+        if not kings:
+            return targets
+
+        if kings & (kings - 1):
+            # Pins are only worked out for a single king
+            legal = 0
+            for move in bb_iter(targets):
+                if not self._would_be_check(sq, move):
+                    legal |= 1 << move
+            return legal
+
+        enemy = 1 - piece.color
+        king_sq = kings.bit_length() - 1
+
+        if sq == king_sq:
+            # Lifts the king so squares behind it on a checking line count as
+            # attacked
+            board.remove_piece(sq)
+            legal = 0
+            for move in bb_iter(targets):
+                if not self._square_attacked_by(move, enemy):
+                    legal |= 1 << move
+            board.add_piece(piece, sq)
+            return legal
+
+        pin_rays, check_mask = self._pins_and_check_mask(king_sq, enemy)
+        targets &= check_mask
+        pin_ray = pin_rays.get(sq)
+        if pin_ray is not None:
+            targets &= pin_ray
+
+        return targets
 
-        return result
-    
     def _would_be_check(self, pos1: Position, pos2: Position) -> bool:
         """
         Simulates a move to determine it would put that player in check
         """
-        game_copy: ChessStub = deepcopy(self)
-        game_copy.play_move(pos1, pos2)
-        game_copy.next_turn()
+        self.play_move(pos1, pos2)
+        self.next_turn()
+        check = self.is_in_check
+        self.undo_move()
 
-        return game_copy.is_in_check
+        return check
 
     def play_move(self, pos1: Position, pos2: Position) -> None:
         """
         Plays a move. Does not check for legality. Increments the turn counter.
         """
-        self.board.move_piece(pos1, pos2)
+        turn = self._turn
+        captured = self._board.move_piece(pos1, pos2)
+        if captured is not None:
+            self._captured[captured.color * 6 + captured.ptype] += 1
+
+        self._undo_stack.append((pos1, pos2, captured, turn))
         self.next_turn()
+
+    def undo_move(self) -> None:
+        """
+        Takes back the last move played, restoring any captured piece and the
+        turn
+        Raises ValueError if no moves have been played
+        """
+        if not self._undo_stack:
+            raise ValueError("Game Error: no move to undo")
+
+        pos1, pos2, captured, turn = self._undo_stack.pop()
+        self._board.move_piece(pos2, pos1)
+        if captured is not None:
+            self._board.add_piece(captured, pos2)
+            self._captured[captured.color * 6 + captured.ptype] -= 1
+
+        self._turn = turn
     
     ### Notation ###
 
@@ -251,7 +388,7 @@ class ChessStub:
 
     def str_to_pos(self, pos: str) -> Position:
         """
-        Converts the name of a square (eg. A1) to position tuple (eg. (0,7))
+        Converts the name of a square (eg. a1) to its square index (eg. 56)
         Raises ValueError if position is invalid
         """
         r: int = 8 - int(pos[1])
@@ -260,20 +397,18 @@ class ChessStub:
         if not 0 <= r <= 7 or not 0 <= f <= 7:
             raise ValueError("Invalid position")
 
-        return r, f
+        return r * 8 + f
 
     def str_to_piece(self, piece: str) -> Piece:
         """
         Converts the name of a piece (eg. BK) to Piece object (a black king)
         Raises ValueError if piece name is invalid
         """
-        try:
-            color: Color = Color[piece[0]]
-            ptype: PieceType = PieceType[piece[1]]
-        except KeyError:
+        result = _PIECE_NAMES.get(piece[:2])
+        if result is None:
             raise ValueError("Invalid piece color or type")
 
-        return Piece(color, ptype)
+        return result
 
     def read_notation(self, notation: str) -> tuple[Position, Position]:
         """
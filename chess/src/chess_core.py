@@ -0,0 +1,188 @@
+"""
+Numba-compiled legal move generation over a Board's mailbox
+
+Importing this module raises ImportError if numba is not installed
+"""
+
+import numpy as np
+from numba import njit
+
+# Mailbox codes are color * 6 + ptype + 1, with 0 for an empty square
+_PAWN, _KNIGHT, _BISHOP, _ROOK, _QUEEN, _KING = 1, 2, 3, 4, 5, 6
+
+_KNIGHT_DELTAS = np.array(((-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                           (1, -2), (1, 2), (2, -1), (2, 1)), dtype=np.int64)
+_KING_DELTAS = np.array(((-1, -1), (-1, 0), (-1, 1), (0, -1),
+                         (0, 1), (1, -1), (1, 0), (1, 1)), dtype=np.int64)
+_BISHOP_DELTAS = np.array(((-1, -1), (-1, 1), (1, -1), (1, 1)),
+                          dtype=np.int64)
+_ROOK_DELTAS = np.array(((-1, 0), (0, -1), (0, 1), (1, 0)), dtype=np.int64)
+
+
+@njit(cache=True)
+def _attacked(board, sq, by_color):
+    """
+    Returns whether any piece of by_color attacks square sq
+    """
+    r0 = sq >> 3
+    f0 = sq & 7
+    base = by_color * 6
+
+    # Pawns of by_color attack towards the other side of the board
+    pr = r0 + 1 if by_color == 0 else r0 - 1
+    if 0 <= pr <= 7:
+        for df in (-1, 1):
+            pf = f0 + df
+            if 0 <= pf <= 7 and board[pr * 8 + pf] == base + _PAWN:
+                return True
+
+    for k in range(8):
+        r = r0 + _KNIGHT_DELTAS[k, 0]
+        f = f0 + _KNIGHT_DELTAS[k, 1]
+        if 0 <= r <= 7 and 0 <= f <= 7 and board[r * 8 + f] == base + _KNIGHT:
+            return True
+
+        r = r0 + _KING_DELTAS[k, 0]
+        f = f0 + _KING_DELTAS[k, 1]
+        if 0 <= r <= 7 and 0 <= f <= 7 and board[r * 8 + f] == base + _KING:
+            return True
+
+    for k in range(4):
+        for diagonal in (True, False):
+            if diagonal:
+                dr = _BISHOP_DELTAS[k, 0]
+                df = _BISHOP_DELTAS[k, 1]
+                slider = base + _BISHOP
+            else:
+                dr = _ROOK_DELTAS[k, 0]
+                df = _ROOK_DELTAS[k, 1]
+                slider = base + _ROOK
+            r = r0 + dr
+            f = f0 + df
+            while 0 <= r <= 7 and 0 <= f <= 7:
+                code = board[r * 8 + f]
+                if code != 0:
+                    if code == slider or code == base + _QUEEN:
+                        return True
+                    break
+                r += dr
+                f += df
+
+    return False
+
+
+@njit(cache=True)
+def _pseudo_targets(board, sq, code):
+    """
+    Returns the bitboard of squares the piece with the given code on sq can
+    move to, ignoring checks
+    """
+    color = (code - 1) // 6
+    ptype = code - color * 6
+    r0 = sq >> 3
+    f0 = sq & 7
+    result = np.uint64(0)
+
+    if ptype == _PAWN:
+        step = -1 if color == 0 else 1
+        start_rank = 6 if color == 0 else 1
+        r = r0 + step
+        if 0 <= r <= 7:
+            if board[r * 8 + f0] == 0:
+                result |= np.uint64(1) << np.uint64(r * 8 + f0)
+                r2 = r + step
+                if r0 == start_rank and board[r2 * 8 + f0] == 0:
+                    result |= np.uint64(1) << np.uint64(r2 * 8 + f0)
+            for df in (-1, 1):
+                f = f0 + df
+                if 0 <= f <= 7:
+                    target = board[r * 8 + f]
+                    if target != 0 and (target - 1) // 6 != color:
+                        result |= np.uint64(1) << np.uint64(r * 8 + f)
+
+    elif ptype == _KNIGHT or ptype == _KING:
+        deltas = _KNIGHT_DELTAS if ptype == _KNIGHT else _KING_DELTAS
+        for k in range(8):
+            r = r0 + deltas[k, 0]
+            f = f0 + deltas[k, 1]
+            if 0 <= r <= 7 and 0 <= f <= 7:
+                target = board[r * 8 + f]
+                if target == 0 or (target - 1) // 6 != color:
+                    result |= np.uint64(1) << np.uint64(r * 8 + f)
+
+    else:
+        for k in range(4):
+            for diagonal in (True, False):
+                if diagonal:
+                    if ptype == _ROOK:
+                        continue
+                    dr = _BISHOP_DELTAS[k, 0]
+                    df = _BISHOP_DELTAS[k, 1]
+                else:
+                    if ptype == _BISHOP:
+                        continue
+                    dr = _ROOK_DELTAS[k, 0]
+                    df = _ROOK_DELTAS[k, 1]
+                r = r0 + dr
+                f = f0 + df
+                while 0 <= r <= 7 and 0 <= f <= 7:
+                    target = board[r * 8 + f]
+                    if target != 0:
+                        if (target - 1) // 6 != color:
+                            result |= np.uint64(1) << np.uint64(r * 8 + f)
+                        break
+                    result |= np.uint64(1) << np.uint64(r * 8 + f)
+                    r += dr
+                    f += df
+
+    return result
+
+
+@njit(cache=True)
+def _legal_targets(board, sq):
+    """
+    Returns the bitboard of squares the piece on sq can move to without
+    leaving any of its own kings attacked. Each candidate is played on the
+    board and taken back before returning
+    """
+    code = board[sq]
+    if code == 0:
+        return np.uint64(0)
+
+    color = (code - 1) // 6
+    own_king = color * 6 + _KING
+    result = np.uint64(0)
+    targets = _pseudo_targets(board, sq, code)
+
+    for to in range(64):
+        if not (targets >> np.uint64(to)) & np.uint64(1):
+            continue
+
+        captured = board[to]
+        board[to] = code
+        board[sq] = 0
+
+        # Boards can have several kings of a color, and the move is illegal
+        # if any of them is left attacked
+        in_check = False
+        for i in range(64):
+            if board[i] == own_king and _attacked(board, i, 1 - color):
+                in_check = True
+                break
+
+        if not in_check:
+            result |= np.uint64(1) << np.uint64(to)
+
+        board[sq] = code
+        board[to] = captured
+
+    return result
+
+
+def legal_targets(mailbox: bytearray, sq: int) -> int:
+    """
+    Returns the bitboard of squares the piece on square sq of the given
+    mailbox can legally move to (0 if the square is empty)
+    """
+    board = np.frombuffer(mailbox, dtype=np.uint8)
+    return int(_legal_targets(board, sq))
@@ -4,7 +4,8 @@ Test code for chess game
 
 import pytest
 from chess import ChessStub
-from board import Board
+from board import (Board, Color, PieceType, KNIGHT_ATTACKS, KING_ATTACKS,
+                   PAWN_ATTACKS, bb_to_positions)
 
 def test_init() -> None:
     """
@@ -18,11 +19,11 @@ def test_init_attribs() -> None:
     """
     game = ChessStub()
     assert isinstance(game._board, Board)
-    for i, rank in enumerate(game._board._board):
-        for j, _ in enumerate(rank):
-            assert game._board._board[i][j] is None
+    assert game._board._bb == [0] * 12
+    assert game._board._occupied == [0, 0]
+    assert game._board._mailbox == bytearray(64)
     assert game._turn == 0
-    assert game._captured_pieces
+    assert game._captured == bytearray(12)
 
 def test_init_board_setup() -> None:
     """
@@ -31,7 +32,224 @@ def test_init_board_setup() -> None:
     game = ChessStub()
     game.restart()
 
-    for i, rank in enumerate(game._board._board):
-        for j, _ in enumerate(rank):
-            assert game._board._board[i][j] is None
-            raise NotImplementedError
+    for j, ptype in enumerate(Board.first_rank_setup):
+        for r, color, pawn_r in [(0, Color.B, 1), (7, Color.W, 6)]:
+            piece = game.board.get_piece(r * 8 + j)
+            assert piece is not None
+            assert piece.color == color and piece.ptype == ptype
+
+            pawn = game.board.get_piece(pawn_r * 8 + j)
+            assert pawn is not None
+            assert pawn.color == color and pawn.ptype == PieceType.P
+
+    for i in range(2, 6):
+        for j in range(8):
+            assert game.board.is_empty(i * 8 + j)
+
+def test_attack_tables() -> None:
+    """
+    Tests the precomputed knight and king attack tables
+    """
+    assert len(KNIGHT_ATTACKS) == 64 and len(KING_ATTACKS) == 64
+    assert KNIGHT_ATTACKS[0] == (1 << 10) | (1 << 17)
+    assert KNIGHT_ATTACKS[27].bit_count() == 8
+    assert KING_ATTACKS[63].bit_count() == 3
+    assert KING_ATTACKS[36].bit_count() == 8
+    assert PAWN_ATTACKS[Color.W][52] == (1 << 43) | (1 << 45)
+    assert PAWN_ATTACKS[Color.B][8] == 1 << 17
+
+def test_zobrist_hash() -> None:
+    """
+    Tests that the board hash is updated incrementally and only depends on
+    the position
+    """
+    board = Board()
+    assert board.hash == 0
+
+    board.set_up()
+    start_hash = board.hash
+    assert start_hash != 0
+
+    board.move_piece(52, 36)
+    assert board.hash != start_hash
+    board.move_piece(36, 52)
+    assert board.hash == start_hash
+
+    rebuilt = Board()
+    for pos, piece in board.pieces_on_board.items():
+        rebuilt.add_piece(piece, pos)
+    assert rebuilt.hash == start_hash
+
+    board.clear()
+    assert board.hash == 0
+
+def test_board_copy() -> None:
+    """
+    Tests that a copied board is equal to but independent of the original
+    """
+    board = Board()
+    board.set_up()
+    copied = board.copy()
+    assert str(copied) == str(board) and copied.hash == board.hash
+
+    copied.move_piece(52, 36)
+    assert board.get_piece(36) is None
+    assert copied.get_piece(36) is board.get_piece(52)
+    assert copied.hash != board.hash
+
+def test_captured_pieces() -> None:
+    """
+    Tests that captures are counted and valued
+    """
+    game = ChessStub()
+    game.restart()
+    game.play_move(52, 36)
+    game.play_move(11, 27)
+    game.play_move(36, 27)
+
+    assert game.captured_pieces == {"W": [], "B": ["BP"]}
+    assert game.material_balance == 1
+
+    game.play_move(3, 27)
+    assert game.captured_pieces == {"W": ["WP"], "B": ["BP"]}
+    assert game.material_balance == 0
+
+    game.restart()
+    assert game.captured_pieces == {"W": [], "B": []}
+
+def test_slider_attacks() -> None:
+    """
+    Tests the rook and bishop lookups against walking each ray
+    """
+    board = Board()
+    board.set_up()
+    board.move_piece(52, 36)
+    board.move_piece(6, 26)
+
+    for sq in range(64):
+        rook = bishop = 0
+        for directions, is_rook in [([(1,0), (-1,0), (0,1), (0,-1)], True),
+                                    ([(1,1), (1,-1), (-1,1), (-1,-1)], False)]:
+            for i, j in directions:
+                r, f = sq // 8 + i, sq % 8 + j
+                while 0 <= r <= 7 and 0 <= f <= 7:
+                    if is_rook:
+                        rook |= 1 << (r * 8 + f)
+                    else:
+                        bishop |= 1 << (r * 8 + f)
+                    if not board.is_empty(r * 8 + f):
+                        break
+                    r, f = r + i, f + j
+
+        assert board.rook_attacks(sq) == rook
+        assert board.bishop_attacks(sq) == bishop
+
+def test_undo_move() -> None:
+    """
+    Tests that undoing moves restores the board, turn, and captures
+    """
+    game = ChessStub()
+    game.restart()
+    start = str(game.board)
+    start_hash = game.board.hash
+
+    game.play_move(52, 36)
+    game.play_move(11, 27)
+    game.play_move(36, 27)
+    assert game.captured_pieces["B"] == ["BP"]
+
+    game.undo_move()
+    assert game.turn == 0
+    assert game.captured_pieces["B"] == []
+    assert game.board.get_piece(27) is game.str_to_piece("BP")
+
+    game.undo_move()
+    game.undo_move()
+    assert str(game.board) == start and game.board.hash == start_hash
+
+    with pytest.raises(ValueError):
+        game.undo_move()
+
+def test_is_in_check() -> None:
+    """
+    Tests check detection and that moves leaving the king in check are not
+    listed
+    """
+    game = ChessStub()
+    game.restart()
+    assert not game.is_in_check
+
+    # Fool's mate
+    for move in ["f2f3", "e7e5", "g2g4", "d8h4"]:
+        game.play_move(game.str_to_pos(move[:2]), game.str_to_pos(move[2:]))
+    assert game.is_in_check
+    for sq in range(48, 64):
+        assert game.list_legal_moves(sq) == []
+
+    game.undo_move()
+    assert not game.is_in_check
+    assert game._square_attacked_by(game.str_to_pos("h4"), Color.B)
+    assert not game._square_attacked_by(game.str_to_pos("a5"), Color.B)
+
+def test_pinned_piece() -> None:
+    """
+    Tests that a pinned piece may only move along the pin and that the king
+    can't step back along a checking line
+    """
+    game = ChessStub()
+    board = game.board
+    board.add_piece(game.str_to_piece("WK"), game.str_to_pos("e1"))
+    board.add_piece(game.str_to_piece("WN"), game.str_to_pos("e2"))
+    board.add_piece(game.str_to_piece("WQ"), game.str_to_pos("d2"))
+    board.add_piece(game.str_to_piece("BR"), game.str_to_pos("e8"))
+    board.add_piece(game.str_to_piece("BB"), game.str_to_pos("a5"))
+    board.add_piece(game.str_to_piece("BK"), game.str_to_pos("a8"))
+
+    assert game.list_legal_moves(game.str_to_pos("e2")) == []
+    queen_moves = game.list_legal_moves(game.str_to_pos("d2"))
+    assert sorted(queen_moves) == sorted(game.str_to_pos(sq)
+                                         for sq in ["a5", "b4", "c3"])
+
+    board.remove_piece(game.str_to_pos("e2"))
+    king_moves = game.list_legal_moves(game.str_to_pos("e1"))
+    assert sorted(king_moves) == sorted(game.str_to_pos(sq)
+                                        for sq in ["d1", "f1", "f2"])
+
+    # The same answers without the optional compiled path
+    for name in ["d2", "e1"]:
+        sq = game.str_to_pos(name)
+        piece = board.get_piece(sq)
+        assert piece is not None
+        targets = ChessStub._MOVE_GEN[piece.ptype](game, sq, piece)
+        legal = game._legal_targets(sq, piece, targets)
+        assert sorted(bb_to_positions(legal)) == \
+            sorted(game.list_legal_moves(sq))
+
+def test_multiple_kings() -> None:
+    """
+    Tests that a move is illegal if it leaves any of the player's kings in
+    check, on a board with two white kings
+    """
+    game = ChessStub()
+    board = game.board
+    board.add_piece(game.str_to_piece("WK"), game.str_to_pos("a4"))
+    board.add_piece(game.str_to_piece("WK"), game.str_to_pos("h1"))
+    board.add_piece(game.str_to_piece("WN"), game.str_to_pos("b1"))
+    board.add_piece(game.str_to_piece("WR"), game.str_to_pos("a6"))
+    board.add_piece(game.str_to_piece("BR"), game.str_to_pos("h8"))
+    board.add_piece(game.str_to_piece("BK"), game.str_to_pos("c8"))
+
+    # Only the king on h1 is in check, but every move has to deal with it
+    expected = {"b1": [], "a4": [], "a6": ["h6"], "h1": ["g1", "g2"]}
+    for name, moves in expected.items():
+        sq = game.str_to_pos(name)
+        assert sorted(game.list_legal_moves(sq)) == \
+            sorted(game.str_to_pos(move) for move in moves)
+
+        # The same answers without the optional compiled path
+        piece = board.get_piece(sq)
+        assert piece is not None
+        targets = ChessStub._MOVE_GEN[piece.ptype](game, sq, piece)
+        legal = game._legal_targets(sq, piece, targets)
+        assert sorted(bb_to_positions(legal)) == \
+            sorted(game.list_legal_moves(sq))
@@ -10,31 +10,53 @@ from board import Position
 game = ChessStub()
 game.restart()
 
+# Column labels printed above the board
+BOARD_HEADER = "   a   b   c   d   e   f   g   h  "
+
+# Rendered rank strings, keyed by rank, the rank's mailbox codes, and which of
+# its squares are marked, so unchanged ranks are not rebuilt every turn
+_rank_cache: dict[tuple[int, bytes, int], str] = {}
+RANK_CACHE_LIMIT = 1024
+
+def render_rank(game: ChessStub, r: int, marks: int) -> str:
+    """
+    Returns the text of rank r (0 is the 8th rank), with the squares in the
+    marks bitmask (bit f for file f) in brackets
+    """
+    key = (r, bytes(game.board.mailbox[r * 8:r * 8 + 8]), marks)
+    cached = _rank_cache.get(key)
+    if cached is not None:
+        return cached
+
+    parts = [f"\n{8-r} "]
+    for f in range(8):
+        piece = game.board.get_piece(r * 8 + f)
+        name = "--" if piece is None else str(piece)
+        if marks >> f & 1:
+            parts.append("[" + name + "]")
+        else:
+            parts.append(" " + name + " ")
+
+    result = "".join(parts)
+    if len(_rank_cache) >= RANK_CACHE_LIMIT:
+        _rank_cache.clear()
+    _rank_cache[key] = result
+    return result
+
 def print_board(game: ChessStub, list_legal_pos: Optional[Position] = None) -> None:
     """
     Prints the game board
     """
-    legal_marks = []
+    legal_marks = 0
     if list_legal_pos is not None:
-        legal_marks.extend(game.list_legal_moves(list_legal_pos))
+        for sq in game.list_legal_moves(list_legal_pos):
+            legal_marks |= 1 << sq
 
-    result = "   a   b   c   d   e   f   g   h  "
-    for i in range(8):
-        result += f"\n{8-i} "
-        for j in range(8):
-            piece = game.board.get_piece((i,j))
-            if (i,j) in legal_marks:
-                if piece is None:
-                    result += "[--]"
-                else:
-                    result += "[" + str(piece) + "]"
-            else:
-                if piece is None:
-                    result += " -- "
-                else:
-                    result += " " + str(piece) + " "
+    parts = [BOARD_HEADER]
+    for r in range(8):
+        parts.append(render_rank(game, r, legal_marks >> (r * 8) & 0xFF))
     
-    print(f"\n{result}")
+    print("\n" + "".join(parts))
 
 mark = None
 
@@ -54,7 +76,8 @@ while not game.game_over:
         if move.find("list ") == 0:
             print("\nLegal moves list:")
             legal_moves = game.list_legal_moves(game.str_to_pos(move[5:7]))
-            for r, f in legal_moves:
+            for sq in legal_moves:
+                r, f = divmod(sq, 8)
                 print(f"{chr(f+97)}{8-r}")
         elif move.find("mark ") == 0:
             mark = game.str_to_pos(move[5:7])
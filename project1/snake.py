@@ -6,43 +6,76 @@ Jada Potter
 """
 import os
 import sys
-from typing import Optional
+from collections import deque
+from typing import Callable, Optional
 import random
 
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
+import numpy as np
 import pygame
 import pygame.gfxdraw
 
+try:
+    from pygame._sdl2 import video
+except ImportError:
+    video = None
+
+# The board is BOARD_W squares across and BOARD_H squares down, and the snake
+# starts in the middle
+BOARD_W: int = 25
+BOARD_H: int = 25
+START_POS: tuple[int, int] = (BOARD_W // 2, BOARD_H // 2)
+
+# Directions are 0 (up), 1 (left), 2 (down), and 3 (right)
+DELTAS: tuple[tuple[int, int], ...] = ((0, -1), (-1, 0), (0, 1), (1, 0))
+OPPOSITE: tuple[int, ...] = (2, 3, 0, 1)
+DIRECTION_KEYS: dict[int, int] = {pygame.K_w: 0, pygame.K_a: 1,
+                                  pygame.K_s: 2, pygame.K_d: 3}
+
+# Events are polled POLL_RATE times a second, but the snake only moves
+# MOVE_RATE times a second
+POLL_RATE: int = 60
+MOVE_RATE: int = 12
+
 
 class TailQueue:
     """
     Class for the queue of squares that are occupied by the snake's tail
     """
-    __queue: list[tuple[int, int]]
+    __queue: deque[tuple[int, int]]
+    __bits: int
 
     def __init__(self) -> None:
         """
         Constructor - no parameters. Creates an empty queue of squares occupied
         by the snake's tail
         """
-        self.__queue = []
+        self.__queue = deque()
+
+        # Occupied squares as a bitmask, one bit per square at y * BOARD_W + x
+        self.__bits = 0
 
     def add(self, coords: tuple[int, int]) -> None:
         """
         Adds a coordinate point to the queue
         """
-        self.__queue.insert(0, coords)
+        self.__queue.appendleft(coords)
+        x, y = coords
+        self.__bits |= 1 << (y * BOARD_W + x)
 
-    def remove(self) -> None:
+    def remove(self) -> tuple[int, int]:
         """
-        Removes the last coordinate point from the queue
+        Removes the last coordinate point from the queue and returns it
         """
-        self.__queue.pop()
+        removed = self.__queue.pop()
+        x, y = removed
+        self.__bits &= ~(1 << (y * BOARD_W + x))
+        return removed
 
     @property
-    def squares(self) -> list[tuple[int, int]]:
+    def squares(self) -> deque[tuple[int, int]]:
         """
-        Property that gets the list of squares in the queue
+        Property that gets the squares in the queue, newest first
         """
         return self.__queue
 
@@ -50,7 +83,8 @@ class TailQueue:
         """
         Returns True if a coordinate point is in the queue, otherwise False
         """
-        return coords in self.__queue
+        x, y = coords
+        return self.__bits >> (y * BOARD_W + x) & 1 == 1
 
     def __len__(self) -> int:
         """
@@ -64,13 +98,19 @@ class Snake:
     Class for the Snake game
     """
     border: int
-    board_dims: Optional[dict[str, int]]
+    board_left: int
+    board_top: int
+    board_size: int
+    cell_size: int
     score_location: Optional[tuple[int, int]]
 
     snake_pos: tuple[int, int]
-    snake_dir: Optional[str]
+    snake_dir: Optional[int]
+    moved_dir: Optional[int]
     tail_queue: "TailQueue"
     food_pos: Optional[tuple[int, int]]
+    grid: np.ndarray
+    vacated_pos: Optional[tuple[int, int]]
 
     game_title: bool
     game_paused: bool
@@ -78,8 +118,21 @@ class Snake:
 
     menu_button: Optional[pygame.Rect]
 
-    surface: pygame.surface.Surface
+    surface: Optional[pygame.surface.Surface]
+    window: Optional["video.Window"]
+    renderer: Optional["video.Renderer"]
+    texture_cache: dict[pygame.surface.Surface, "video.Texture"]
     clock: pygame.time.Clock
+    event_handlers: dict[int, Callable[[pygame.event.Event], None]]
+
+    needs_redraw: bool
+    redraw_board: bool
+    dirty_rects: Optional[list[pygame.Rect]]
+    score_rect: Optional[pygame.Rect]
+    drawn_score: Optional[int]
+
+    score_cache: dict[int, pygame.surface.Surface]
+    text_cache: dict[tuple[str, pygame.font.Font], pygame.surface.Surface]
 
     big_font: Optional[pygame.font.Font]
     med_font: Optional[pygame.font.Font]
@@ -88,25 +141,43 @@ class Snake:
     font_color: tuple[int, int, int]
     board_color: tuple[int, int, int]
     snake_color: tuple[int, int, int]
+    tail_color: tuple[int, int, int]
     food_color: tuple[int, int, int]
 
+    empty_cell: Optional[pygame.surface.Surface]
+    snake_cell: Optional[pygame.surface.Surface]
+    tail_cell: Optional[pygame.surface.Surface]
+    food_cell: Optional[pygame.surface.Surface]
+
     def __init__(self, width: int = 1280, height: int = 800,
-                 border: int = 64) -> None:
+                 border: int = 64, accelerated: bool = True) -> None:
         """
         Constructor
 
         Parameters:
             width : int : width of window
             height : int : height of window
+            accelerated : bool : draw with the GPU renderer if there is one
         """
         self.border = border
-        self.board_dims = None
+        self.board_left = 0
+        self.board_top = 0
+        self.board_size = 0
+        self.cell_size = 0
         self.score_location = None
 
-        self.snake_pos = (12, 12)
+        self.snake_pos = START_POS
         self.snake_dir = None
+        self.moved_dir = None
         self.tail_queue = TailQueue()
         self.food_pos = None
+        self.vacated_pos = None
+
+        # Occupancy of each square, indexed [y, x]: 0 is empty, 1 is tail, and
+        # 2 is the snake's head
+        self.grid = np.zeros((BOARD_H, BOARD_W), dtype=np.uint8)
+        x, y = START_POS
+        self.grid[y, x] = 2
 
         self.game_title = True
         self.game_paused = False
@@ -118,10 +189,41 @@ class Snake:
         pygame.init()
         pygame.display.set_caption("Snake")
 
-        self.surface = pygame.display.set_mode((width, height),
-                                               pygame.RESIZABLE)
-        
+        # Draw through the GPU renderer when the platform has an accelerated
+        # one, otherwise fall back to blitting onto the display surface
+        self.surface = None
+        self.window = None
+        self.renderer = None
+        self.texture_cache = {}
+        if accelerated:
+            self.create_renderer(width, height)
+        if self.renderer is None:
+            self.surface = pygame.display.set_mode((width, height),
+                                                   pygame.RESIZABLE)
+
         self.clock = pygame.time.Clock()
+
+        # Only queue the events the game handles, so SDL drops the rest (eg.
+        # mouse motion) before they reach Python
+        self.event_handlers = {pygame.QUIT: self.on_quit,
+                               pygame.WINDOWRESIZED: self.on_resize,
+                               pygame.WINDOWEXPOSED: self.on_expose,
+                               pygame.MOUSEBUTTONUP: self.on_click,
+                               pygame.KEYDOWN: self.on_key}
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(list(self.event_handlers))
+
+        # Nothing is drawn on ticks where needs_redraw is False. The whole
+        # window is redrawn and updated when dirty_rects is None
+        self.needs_redraw = True
+        self.redraw_board = True
+        self.dirty_rects = None
+        self.score_rect = None
+        self.drawn_score = None
+
+        # Rendered text, emptied when the fonts are resized
+        self.score_cache = {}
+        self.text_cache = {}
         
         self.big_font = None
         self.med_font = None
@@ -129,8 +231,14 @@ class Snake:
         self.font_color = (220, 220, 220)
         self.board_color = (25, 25, 25)
         self.snake_color = (255, 255, 255)
+        self.tail_color = (123, 0, 123)
         self.food_color = (255, 0, 0)
 
+        self.empty_cell = None
+        self.snake_cell = None
+        self.tail_cell = None
+        self.food_cell = None
+
         self.update_board_dims()
         self.add_food()
 
@@ -141,77 +249,173 @@ class Snake:
         Sets all game values back to default (only after clicking "restart" on
         lose menu)
         """
-        self.snake_pos = (12, 12)
+        self.snake_pos = START_POS
         self.snake_dir = None
+        self.moved_dir = None
         self.tail_queue = TailQueue()
+        self.vacated_pos = None
+        self.grid.fill(0)
+        x, y = START_POS
+        self.grid[y, x] = 2
+        self.needs_redraw = True
+        self.redraw_board = True
         self.add_food()
         
-    def update_snake_pos(self, direction: str) -> None:
+    def update_snake_pos(self, direction: int) -> None:
         """
         Updates the position of the snake based on the inputted direction
-        "w" means up
-        "a" means left
-        "s" means down
-        "d" means right
+        (an index into DELTAS: 0 is up, 1 is left, 2 is down, 3 is right)
         """
+        self.needs_redraw = True
+        self.moved_dir = direction
         self.tail_queue.add(self.snake_pos)
 
         x, y = self.snake_pos
+        self.grid[y, x] = 1
+        dx, dy = DELTAS[direction]
+        new_x, new_y = x + dx, y + dy
 
-        if direction == "w":
-            if y > 0:
-                self.snake_pos = (x, y - 1)
-            else:
-                self.game_lost = True
-        elif direction == "a":
-            if x > 0:
-                self.snake_pos = (x - 1, y)
-            else:
-                self.game_lost = True
-        elif direction == "s":
-            if y < 24:
-                self.snake_pos = (x, y + 1)
-            else:
-                self.game_lost = True
-        elif direction == "d":
-            if x < 24:
-                self.snake_pos = (x + 1, y)
-            else:
-                self.game_lost = True
+        if 0 <= new_x < BOARD_W and 0 <= new_y < BOARD_H:
+            self.snake_pos = (new_x, new_y)
+        else:
+            self.game_lost = True
 
         # Check for tail
         if self.snake_pos in self.tail_queue:
             self.game_lost = True
 
+        x, y = self.snake_pos
+        self.grid[y, x] = 2
+
         # Check for for food
         if self.snake_pos == self.food_pos:
             self.add_food()
         else:
             # Remove last tail segment only if food wasn't found
-            self.tail_queue.remove()
+            self.vacated_pos = self.tail_queue.remove()
+            if self.vacated_pos != self.snake_pos:
+                x, y = self.vacated_pos
+                self.grid[y, x] = 0
 
     def add_food(self):
         """
-        Adds food in a random viable location
+        Adds food in a random viable location, chosen directly from the free
+        cells (no food is placed if the snake fills the board)
         """
-        found = False
-        while not found:
-            try_coord = random.randint(0,24), random.randint(0,24)
-            if try_coord != self.snake_pos:
-                if try_coord not in self.tail_queue:
-                    self.food_pos = try_coord
-                    found = True
+        free = np.flatnonzero(self.grid == 0)
+        if free.size == 0:
+            self.food_pos = None
+            return
+
+        y, x = divmod(int(free[random.randrange(free.size)]), BOARD_W)
+        self.food_pos = (x, y)
 
 
     ### Rendering ###
 
+    def create_renderer(self, width: int, height: int) -> None:
+        """
+        Opens the window with a hardware-accelerated SDL2 renderer, leaving
+        renderer as None if one isn't available
+        """
+        if video is None:
+            return
+
+        window = video.Window("Snake", (width, height), resizable=True)
+        try:
+            self.renderer = video.Renderer(window, accelerated=1)
+        except (pygame.error, RuntimeError):
+            window.destroy()
+            return
+        self.window = window
+
+    def fill(self, col: tuple[int, int, int],
+             rect: Optional[pygame.Rect] = None) -> None:
+        """
+        Fills a rect (or the whole window) with a given color
+        """
+        if self.renderer is None:
+            self.surface.fill(col, rect)
+            return
+
+        self.renderer.draw_color = (*col, 255)
+        if rect is None:
+            self.renderer.clear()
+        else:
+            self.renderer.fill_rect(rect)
+
+    def outline(self, col: tuple[int, int, int], rect: pygame.Rect,
+                width: int) -> None:
+        """
+        Draws the outline of a rect, width pixels thick on the inside
+        """
+        if self.renderer is None:
+            pygame.draw.rect(self.surface, col, rect, width=width)
+            return
+
+        self.renderer.draw_color = (*col, 255)
+        for i in range(width):
+            self.renderer.draw_rect(rect.inflate(-2 * i, -2 * i))
+
+    def texture(self, img: pygame.surface.Surface) -> "video.Texture":
+        """
+        Gets the texture for a surface, uploading it the first time
+        """
+        tex = self.texture_cache.get(img)
+        if tex is None:
+            tex = video.Texture.from_surface(self.renderer, img)
+            self.texture_cache[img] = tex
+        return tex
+
+    def blit(self, img: pygame.surface.Surface,
+             pos: tuple[int, int]) -> pygame.Rect:
+        """
+        Draws a surface with its top left at pos and returns the rect it covers
+        """
+        if self.renderer is None:
+            return self.surface.blit(img, pos)
+
+        rect = img.get_rect(topleft=pos)
+        self.texture(img).draw(dstrect=rect)
+        return rect
+
+    def blit_cells(self, cells: list[tuple[pygame.surface.Surface,
+                                           tuple[int, int]]],
+                   doreturn: bool = True) -> Optional[list[pygame.Rect]]:
+        """
+        Draws a batch of (surface, position) pairs, returning the rects they
+        cover if doreturn is True
+        """
+        if self.renderer is None:
+            return self.surface.blits(cells, doreturn=doreturn)
+
+        rects = []
+        for img, pos in cells:
+            rect = img.get_rect(topleft=pos)
+            self.texture(img).draw(dstrect=rect)
+            rects.append(rect)
+        return rects if doreturn else None
+
+    def display_format(self, img: pygame.surface.Surface,
+                       alpha: bool = False) -> pygame.surface.Surface:
+        """
+        Converts a surface to the display's pixel format so it blits faster
+        (textures are uploaded from it as it is)
+        """
+        if self.renderer is not None:
+            return img
+        return img.convert_alpha() if alpha else img.convert()
+
     def update_board_dims(self) -> None:
         """
         Recalculates the dimensions of the board (run when application is opened
         and when window is resized)
         """
-        surface_width = self.surface.get_width()
-        surface_height = self.surface.get_height()
+        if self.renderer is not None:
+            surface_width, surface_height = self.window.size
+        else:
+            surface_width = self.surface.get_width()
+            surface_height = self.surface.get_height()
 
         if surface_height < surface_width:
             board_size = surface_height - 2 * self.border
@@ -222,15 +426,38 @@ class Snake:
             board_left = self.border
             board_top = surface_height // 2 - board_size // 2
 
-        self.board_dims = {"left": board_left, "top": board_top,
-                           "size": board_size, "cell_size": board_size // 25}
+        self.board_left = board_left
+        self.board_top = board_top
+        self.board_size = board_size
+        self.cell_size = board_size // max(BOARD_W, BOARD_H)
 
         self.big_font = pygame.font.Font(None, board_size // 12)
         self.med_font = pygame.font.Font(None, board_size // 16)
         self.small_font = pygame.font.Font(None, board_size // 24)
 
         self.score_location = (board_left, board_top - board_size // 16)
+        self.needs_redraw = True
+        self.redraw_board = True
 
+        self.score_cache.clear()
+        self.text_cache.clear()
+        self.texture_cache.clear()
+
+        # One pre-filled surface per cell color, blitted for every cell
+        cell_size = max(self.cell_size, 0)
+        self.empty_cell = self.make_cell(cell_size, (0, 0, 0))
+        self.snake_cell = self.make_cell(cell_size, self.snake_color)
+        self.tail_cell = self.make_cell(cell_size, self.tail_color)
+        self.food_cell = self.make_cell(cell_size, self.food_color)
+
+    def make_cell(self, cell_size: int,
+                  col: tuple[int, int, int]) -> pygame.surface.Surface:
+        """
+        Creates a square surface the size of a cell, filled with a given color
+        """
+        cell = self.display_format(pygame.Surface((cell_size, cell_size)))
+        cell.fill(col)
+        return cell
 
     def draw_cell(self, coords: tuple[int, int],
                   col: tuple[int, int, int]) -> None:
@@ -239,42 +466,119 @@ class Snake:
         """
         x, y = coords
 
-        cell_size = self.board_dims["cell_size"]
-        cell_left = self.board_dims["left"] + cell_size * x
-        cell_top = self.board_dims["top"] + cell_size * y
+        cell_size = self.cell_size
+        cell_left = self.board_left + cell_size * x
+        cell_top = self.board_top + cell_size * y
 
-        pygame.draw.rect(self.surface, col, pygame.Rect(cell_left, cell_top,
-                                                        cell_size, cell_size))
+        self.fill(col, pygame.Rect(cell_left, cell_top, cell_size, cell_size))
 
     def draw_window(self) -> None:
         """
-        Draws the contents of the window
+        Draws the contents of the window. After the first frame only the cells
+        and score that can have changed are redrawn, and their rects are added
+        to dirty_rects
+        """
+        # The snake overlaps itself on the frame it is lost
+        if self.redraw_board or self.game_lost:
+            self.draw_board()
+            return
+
+        board_left = self.board_left
+        board_top = self.board_top
+        cell_size = self.cell_size
+
+        # Clear the square the tail left, then draw the head, the square it
+        # moved from, and the food
+        cells = []
+        if self.vacated_pos is not None:
+            x, y = self.vacated_pos
+            cells.append((self.empty_cell, (board_left + cell_size * x,
+                                            board_top + cell_size * y)))
+            self.vacated_pos = None
+
+        head_x, head_y = self.snake_pos
+        cells.append((self.snake_cell, (board_left + cell_size * head_x,
+                                        board_top + cell_size * head_y)))
+
+        squares = self.tail_queue.squares
+        if squares:
+            x, y = squares[0]
+            cells.append((self.tail_cell, (board_left + cell_size * x,
+                                           board_top + cell_size * y)))
+
+        if self.food_pos is not None:
+            food_x, food_y = self.food_pos
+            cells.append((self.food_cell, (board_left + cell_size * food_x,
+                                           board_top + cell_size * food_y)))
+
+        self.dirty_rects.extend(self.blit_cells(cells))
+        self.draw_score()
+
+    def draw_board(self) -> None:
+        """
+        Draws the whole board, snake, food, and score, and marks the whole
+        window to be updated
         """
-        self.surface.fill(self.board_color)
+        self.fill(self.board_color)
 
         # Draw the board
-        board_size = self.board_dims["size"]
-        board_left = self.board_dims["left"]
-        board_top = self.board_dims["top"]
+        board_size = self.board_size
+        board_left = self.board_left
+        board_top = self.board_top
+
+        # Solid rects are filled rather than drawn, so the surface is never
+        # locked and the cell blits below can run straight after
+        self.fill((0, 0, 0), pygame.Rect(board_left, board_top, board_size,
+                                         board_size))
+
+        # Draw snake head, tail, and food in one batch
+        cell_size = self.cell_size
+
+        head_x, head_y = self.snake_pos
+
+        cells = [(self.snake_cell, (board_left + cell_size * head_x,
+                                    board_top + cell_size * head_y))]
+        cells.extend((self.tail_cell, (board_left + cell_size * x,
+                                       board_top + cell_size * y))
+                     for x, y in self.tail_queue.squares)
+
+        if self.food_pos is not None:
+            food_x, food_y = self.food_pos
+            cells.append((self.food_cell, (board_left + cell_size * food_x,
+                                           board_top + cell_size * food_y)))
 
-        pygame.draw.rect(self.surface, (0, 0, 0),
-                         pygame.Rect(board_left, board_top, board_size,
-                                     board_size))
+        self.blit_cells(cells, doreturn=False)
 
-        # Draw snake head
-        self.draw_cell(self.snake_pos, self.snake_color)
+        self.score_rect = None
+        self.draw_score()
 
-        # Draw snake tail
-        for square in self.tail_queue.squares:
-            self.draw_cell(square, (123,0,123))
+        self.redraw_board = False
+        self.dirty_rects = None
 
-        # Draw food
-        self.draw_cell(self.food_pos, self.food_color)
+    def draw_score(self) -> None:
+        """
+        Draws the score over the previous one, unless it hasn't changed since
+        it was last drawn
+        """
+        score = len(self.tail_queue) + 1
+        if score == self.drawn_score and self.score_rect is not None:
+            return
+
+        if self.score_rect is not None:
+            self.fill(self.board_color, self.score_rect)
+            if self.dirty_rects is not None:
+                self.dirty_rects.append(self.score_rect)
 
-        # Draw score
-        img = self.med_font.render(f"Score: {len(self.tail_queue) + 1}", True,
-                                   self.font_color)
-        self.surface.blit(img, self.score_location)
+        img = self.score_cache.get(score)
+        if img is None:
+            img = self.display_format(self.med_font.render(
+                f"Score: {score}", True, self.font_color), alpha=True)
+            self.score_cache[score] = img
+
+        self.score_rect = self.blit(img, self.score_location)
+        self.drawn_score = score
+        if self.dirty_rects is not None:
+            self.dirty_rects.append(self.score_rect)
 
     ### Menu methods ###
 
@@ -282,16 +586,18 @@ class Snake:
         """
         Draws the menu when the game is either on title, paused, or lost
         """
-        self.surface.fill(self.board_color)
+        self.redraw_board = True
+        self.dirty_rects = None
+
+        self.fill(self.board_color)
 
         # Draw the menu outline
-        menu_size = self.board_dims["size"] // 2
-        menu_left = self.board_dims["left"] + menu_size // 2
-        menu_top = self.board_dims["top"] + menu_size // 2
+        menu_size = self.board_size // 2
+        menu_left = self.board_left + menu_size // 2
+        menu_top = self.board_top + menu_size // 2
 
-        pygame.draw.rect(self.surface, (0, 0, 0),
-                         pygame.Rect(menu_left, menu_top, menu_size,
-                                     menu_size))
+        self.fill((0, 0, 0), pygame.Rect(menu_left, menu_top, menu_size,
+                                         menu_size))
 
         # Draw menu button
         button_width = menu_size // 2
@@ -302,8 +608,7 @@ class Snake:
         self.menu_button = pygame.Rect(button_left, button_top, button_width,
                                        button_height)
 
-        pygame.draw.rect(self.surface, self.font_color, self.menu_button,
-                         width=2)
+        self.outline(self.font_color, self.menu_button, 2)
 
         # Draw menu text
         center = menu_left + menu_size // 2
@@ -326,12 +631,17 @@ class Snake:
     def draw_text(self, text: str, font: pygame.font.Font,
                   location: tuple[int, int]) -> None:
         """
-        A function that draws text
+        A function that draws text, rendering it only the first time it is
+        drawn with that font
         """
-        img = font.render(text, True, self.font_color)
+        img = self.text_cache.get((text, font))
+        if img is None:
+            img = self.display_format(font.render(text, True, self.font_color),
+                                      alpha=True)
+            self.text_cache[(text, font)] = img
         img_rect = img.get_rect()
         img_rect.center = location
-        self.surface.blit(img, img_rect)
+        self.blit(img, img_rect.topleft)
 
     def click_in_button(self, pos: tuple[int, int]) -> bool:
         """
@@ -347,6 +657,63 @@ class Snake:
         return False
 
 
+    ### Event handlers ###
+
+    def on_quit(self, event: pygame.event.Event) -> None:
+        """
+        Closes the game when the window is closed
+        """
+        pygame.quit()
+        sys.exit()
+
+    def on_resize(self, event: pygame.event.Event) -> None:
+        """
+        Resizes the board to fit the window
+        """
+        self.update_board_dims()
+
+    def on_expose(self, event: pygame.event.Event) -> None:
+        """
+        Redraws the whole window when it is uncovered
+        """
+        self.needs_redraw = True
+        self.redraw_board = True
+
+    def on_click(self, event: pygame.event.Event) -> None:
+        """
+        Handles clicks on the menu button
+        """
+        if not (self.game_title or self.game_paused or self.game_lost):
+            return
+
+        if self.click_in_button(event.pos):
+            if self.game_title or self.game_paused:
+                self.game_title = False
+                self.game_paused = False
+            elif self.game_lost:
+                self.restart_game()
+                self.game_lost = False
+            self.needs_redraw = True
+
+    def on_key(self, event: pygame.event.Event) -> None:
+        """
+        Handles turning the snake and pausing while the game is playing
+        """
+        if self.game_title or self.game_paused or self.game_lost:
+            return
+
+        # The snake can't turn back on itself once it has a tail. This is
+        # checked against the last move, since several keys can be pressed
+        # between moves
+        direction = DIRECTION_KEYS.get(event.key)
+        if direction is not None:
+            if self.moved_dir != OPPOSITE[direction] or \
+                    len(self.tail_queue) == 0:
+                self.snake_dir = direction
+        if event.key == pygame.K_ESCAPE:
+            self.game_paused = True
+            self.needs_redraw = True
+
     def event_loop(self) -> None:
         """
         Handles user interactions
@@ -355,56 +722,56 @@ class Snake:
 
         Returns: nothing
         """
+        # Looked up once rather than on every tick
+        get_events = pygame.event.get
+        get_handler = self.event_handlers.get
+        update_display = pygame.display.update
+        tick = self.clock.tick
+
+        # Milliseconds since the snake last moved
+        move_ms = 1000 / MOVE_RATE
+        elapsed = 0.0
+
         while True:
             # Process Pygame events
-            events = pygame.event.get()
-            for event in events:
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                if event.type == pygame.WINDOWRESIZED:
-                    self.update_board_dims()
-
-                if self.game_title or self.game_paused or self.game_lost:
-                    if event.type == pygame.MOUSEBUTTONUP:
-                        if self.click_in_button(event.pos):
-                            if self.game_title or self.game_paused:
-                                self.game_title = False
-                                self.game_paused = False
-                            elif self.game_lost:
-                                self.restart_game()
-                                self.game_lost = False
-
+            for event in get_events():
+                handler = get_handler(event.type)
+                if handler is not None:
+                    handler(event)
+
+            # Change location of snake if the game is playing and it's moving
+            in_menu = self.game_title or self.game_paused or self.game_lost
+            if in_menu or self.snake_dir is None:
+                elapsed = 0.0
+            elif elapsed >= move_ms:
+                # Don't try to catch up on moves missed during a long stall
+                elapsed = min(elapsed - move_ms, move_ms)
+                self.update_snake_pos(self.snake_dir)
+
+            # Only draw when something changed since the last frame
+            if self.needs_redraw:
+                # If in title, paused, or lost, draw menu
+                if in_menu:
+                    self.draw_menu()
                 else:
-                    if event.type == pygame.KEYDOWN:
-                        if event.key == pygame.K_w:
-                            if self.snake_dir != "s" or len(self.tail_queue) == 0:
-                                self.snake_dir = "w"
-                        if event.key == pygame.K_a:
-                            if self.snake_dir != "d" or len(self.tail_queue) == 0:
-                                self.snake_dir = "a"
-                        if event.key == pygame.K_s:
-                            if self.snake_dir != "w" or len(self.tail_queue) == 0:
-                                self.snake_dir = "s"
-                        if event.key == pygame.K_d:
-                            if self.snake_dir != "a" or len(self.tail_queue) == 0:
-                                self.snake_dir = "d"
-                        if event.key == pygame.K_ESCAPE:
-                            self.game_paused = True
-
-            # If in title, paused, or lost, draw menu
-            if self.game_title or self.game_paused or self.game_lost:
-                self.draw_menu()
-            # If game is playing
-            else:
-                # Change location of snake if moving
-                if self.snake_dir is not None:
-                    self.update_snake_pos(self.snake_dir)
-
-                self.draw_window()
-
-            pygame.display.update()
-            self.clock.tick(12)
+                    self.draw_window()
+
+                # The renderer's back buffer isn't kept between frames, so
+                # every frame it presents is drawn from scratch
+                if self.renderer is not None:
+                    self.renderer.present()
+                    self.redraw_board = True
+                elif self.dirty_rects is None:
+                    update_display()
+                else:
+                    update_display(self.dirty_rects)
+                self.dirty_rects = []
+
+                # The frame the game is lost on shows the board, so the lose
+                # menu still has to be drawn on the next tick
+                self.needs_redraw = self.game_lost and not in_menu
+
+            elapsed += tick(POLL_RATE)
 
 
 if __name__ == "__main__":
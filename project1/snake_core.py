@@ -0,0 +1,125 @@
+"""
+Numba-compiled game state updates for running Snake without rendering (eg.
+for self-play or training). Requires numba and numpy
+"""
+import random
+
+import numpy as np
+from numba import njit
+
+# Same board size as snake.BOARD_W and snake.BOARD_H. Numba treats globals as
+# compile-time constants, so the bounds and loops below are specialized to it
+BOARD_W = 25
+BOARD_H = 25
+
+# Same direction encoding as snake.DELTAS: 0 up, 1 left, 2 down, 3 right
+_DX = np.array((0, -1, 0, 1), dtype=np.int64)
+_DY = np.array((-1, 0, 1, 0), dtype=np.int64)
+
+
+@njit(cache=True)
+def step(life, hx, hy, length, direction, fx, fy):
+    """
+    Moves the snake one square, following the same rules as
+    Snake.update_snake_pos
+
+    life[y, x] is the number of moves until that tail square is freed (0 if
+    it is empty) and length is the number of tail squares. Returns the new
+    head x and y, the new length, whether food was eaten, and whether the
+    snake died
+    """
+    # The square the head leaves becomes the newest tail square
+    life[hy, hx] = length + 1
+
+    nx = hx + _DX[direction]
+    ny = hy + _DY[direction]
+    dead = False
+    if 0 <= nx < BOARD_W and 0 <= ny < BOARD_H:
+        hx = nx
+        hy = ny
+    else:
+        dead = True
+
+    if life[hy, hx] > 0:
+        dead = True
+
+    ate = hx == fx and hy == fy
+    if ate:
+        length += 1
+    else:
+        # Every tail square ages by one, which frees the oldest
+        for y in range(BOARD_H):
+            for x in range(BOARD_W):
+                if life[y, x] > 0:
+                    life[y, x] -= 1
+
+    return hx, hy, length, ate, dead
+
+
+@njit(cache=True)
+def free_cell(life, hx, hy, r):
+    """
+    Returns the x and y of a free square picked by r (in [0, 1)), counting
+    free squares row by row like Snake.add_food, or (-1, -1) if the board is
+    full
+    """
+    free = 0
+    for y in range(BOARD_H):
+        for x in range(BOARD_W):
+            if life[y, x] == 0 and not (x == hx and y == hy):
+                free += 1
+
+    if free == 0:
+        return -1, -1
+
+    target = int(r * free)
+    for y in range(BOARD_H):
+        for x in range(BOARD_W):
+            if life[y, x] == 0 and not (x == hx and y == hy):
+                if target == 0:
+                    return x, y
+                target -= 1
+
+    return -1, -1
+
+
+class HeadlessSnake:
+    """
+    Snake game state stepped by the compiled kernels, with no window
+    """
+    life: np.ndarray
+    snake_pos: tuple[int, int]
+    length: int
+    food_pos: tuple[int, int]
+    game_lost: bool
+
+    def __init__(self) -> None:
+        """
+        Constructor - starts a game with the snake in the middle of the board
+        """
+        self.life = np.zeros((BOARD_H, BOARD_W), dtype=np.int32)
+        self.snake_pos = (BOARD_W // 2, BOARD_H // 2)
+        self.length = 0
+        self.game_lost = False
+        self.add_food()
+
+    def add_food(self) -> None:
+        """
+        Puts food on a random free square ((-1, -1) if there is none)
+        """
+        x, y = self.snake_pos
+        self.food_pos = free_cell(self.life, x, y, random.random())
+
+    def step(self, direction: int) -> None:
+        """
+        Moves the snake in the given direction (an index into snake.DELTAS)
+        """
+        x, y = self.snake_pos
+        food_x, food_y = self.food_pos
+        x, y, self.length, ate, dead = step(self.life, x, y, self.length,
+                                            direction, food_x, food_y)
+        self.snake_pos = (x, y)
+        if dead:
+            self.game_lost = True
+        if ate:
+            self.add_food()
@@ -0,0 +1,193 @@
+"""
+Test code for snake game
+"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import random
+
+import numpy as np
+import pygame
+import pytest
+import snake
+from snake_core import HeadlessSnake, free_cell
+
+
+class StopLoop(Exception):
+    """
+    Raised by FakeClock to leave the event loop
+    """
+
+
+class FakeClock:
+    """
+    Stands in for pygame.time.Clock, letting a whole move interval pass on
+    every tick and stopping the loop after a number of ticks
+    """
+    def __init__(self, ticks: int) -> None:
+        self.ticks = ticks
+
+    def tick(self, framerate: int = 0) -> int:
+        self.ticks -= 1
+        if self.ticks < 0:
+            raise StopLoop
+        return 1000
+
+
+def make_game(monkeypatch: pytest.MonkeyPatch) -> snake.Snake:
+    """
+    Creates a game on the dummy video driver without entering its event loop
+    """
+    with monkeypatch.context() as m:
+        m.setattr(snake.Snake, "event_loop", lambda self: None)
+        game = snake.Snake(640, 480, accelerated=False)
+    game.game_title = False
+    return game
+
+
+def run_loop(game: snake.Snake, ticks: int) -> None:
+    """
+    Runs the game's event loop for a number of ticks
+    """
+    game.clock = FakeClock(ticks)
+    with pytest.raises(StopLoop):
+        game.event_loop()
+
+
+def test_lose_menu_drawn(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Tests that the lose menu is drawn after the snake hits a wall
+    """
+    game = make_game(monkeypatch)
+    menus = []
+    draw_menu = game.draw_menu
+    def record_menu() -> None:
+        menus.append(game.game_lost)
+        draw_menu()
+    monkeypatch.setattr(game, "draw_menu", record_menu)
+
+    game.snake_pos = (snake.BOARD_W - 1, 12)
+    game.snake_dir = 3
+    run_loop(game, 5)
+
+    assert game.game_lost
+    assert menus and all(menus)
+    pygame.quit()
+
+
+def step_both(game: snake.Snake, headless: HeadlessSnake,
+              direction: int) -> None:
+    """
+    Moves a Snake game and a HeadlessSnake in the same direction and checks
+    that they agree. The headless game is then given the same food, since
+    the two place food with different random draws
+    """
+    game.update_snake_pos(direction)
+    headless.step(direction)
+
+    assert headless.snake_pos == game.snake_pos
+    assert headless.length == len(game.tail_queue)
+    assert headless.game_lost == game.game_lost
+    tail = {(int(x), int(y)) for y, x in zip(*np.nonzero(headless.life))}
+    assert tail == set(game.tail_queue.squares)
+
+    headless.food_pos = game.food_pos
+
+
+def start_both(monkeypatch: pytest.MonkeyPatch) -> tuple[snake.Snake,
+                                                          HeadlessSnake]:
+    """
+    Creates a Snake game and a HeadlessSnake with the same food
+    """
+    game = make_game(monkeypatch)
+    headless = HeadlessSnake()
+    headless.food_pos = game.food_pos
+    return game, headless
+
+
+def test_headless_wall_death(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Tests that the headless snake dies on the same move as the game when it
+    runs into a wall
+    """
+    game, headless = start_both(monkeypatch)
+    game.food_pos = headless.food_pos = (0, 0)
+
+    for _ in range(snake.START_POS[1]):
+        step_both(game, headless, 0)
+        assert not headless.game_lost
+
+    step_both(game, headless, 0)
+    assert headless.game_lost
+    pygame.quit()
+
+
+def test_headless_self_collision(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Tests that the headless snake grows when it eats and dies when it turns
+    into its tail, on the same moves as the game
+    """
+    game, headless = start_both(monkeypatch)
+
+    # Eat four times moving right, then turn back into the tail
+    for i in range(4):
+        x, y = game.snake_pos
+        game.food_pos = headless.food_pos = (x + 1, y)
+        step_both(game, headless, 3)
+        assert headless.length == i + 1
+
+    step_both(game, headless, 2)
+    step_both(game, headless, 1)
+    assert not headless.game_lost
+    step_both(game, headless, 0)
+    assert headless.game_lost
+    pygame.quit()
+
+
+def test_headless_matches_game(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Tests that the headless snake matches the game move for move over games
+    that mostly head for the food
+    """
+    for seed in range(20):
+        rng = random.Random(seed)
+        game, headless = start_both(monkeypatch)
+
+        for _ in range(400):
+            x, y = game.snake_pos
+            food_x, food_y = game.food_pos
+            directions = [3 if food_x > x else 1, 2 if food_y > y else 0]
+            directions += rng.sample(range(4), 4)
+
+            # Occasionally move at random so the snake also runs into walls
+            # and its own tail
+            direction = rng.randrange(4)
+            if rng.random() > 0.02:
+                for d in directions:
+                    dx, dy = snake.DELTAS[d]
+                    new_x, new_y = x + dx, y + dy
+                    if 0 <= new_x < snake.BOARD_W and \
+                            0 <= new_y < snake.BOARD_H and \
+                            (new_x, new_y) not in game.tail_queue:
+                        direction = d
+                        break
+
+            step_both(game, headless, direction)
+            if game.game_lost or game.food_pos is None:
+                break
+
+        pygame.quit()
+
+
+def test_free_cell() -> None:
+    """
+    Tests that free_cell finds the only free square and returns (-1, -1) on a
+    full board
+    """
+    life = np.ones((snake.BOARD_H, snake.BOARD_W), dtype=np.int32)
+    life[3, 7] = 0
+    life[0, 0] = 0
+    assert free_cell(life, 0, 0, 0.99) == (7, 3)
+
+    life[3, 7] = 1
+    assert free_cell(life, 0, 0, 0.5) == (-1, -1)